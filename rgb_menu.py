@@ -1,13 +1,32 @@
 import subprocess
 import os
 import json
+import re
+import shlex
+import shutil
+import sys
 from pathlib import Path
 
+import click
+from usbx import USBError
+
+from rgbkb.cli import cli as rgbkb_cli, run_effect
+
 # Config paths
 CONFIG_DIR = Path.home() / ".config" / "rgbkb"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 SYSTEMD_SERVICE_NAME = "rgbkb-startup.service"
 SYSTEMD_USER_DIR = Path.home() / ".config" / "systemd" / "user"
+SERVICE_FILE = SYSTEMD_USER_DIR / SYSTEMD_SERVICE_NAME
+
+# Memoized location of the rgbkb executable (str once resolved)
+_RGBKB_PATH = None
+
+# ANSI "erase display + cursor home" escape sequence
+_CLEAR = "\x1b[2J\x1b[H"
+
+# 6-digit hex color code
+_HEX6 = re.compile(r"[0-9a-fA-F]{6}")
 
 def ensure_config_dir():
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
@@ -15,30 +34,49 @@ def ensure_config_dir():
 def ensure_systemd_dir():
     SYSTEMD_USER_DIR.mkdir(parents=True, exist_ok=True)
 
+# In-process cache so repeated load/save calls skip JSON parsing and disk I/O
+_CACHE = {"mtime": None, "cfg": None}
+
 def save_config(effect: str, params: dict):
-    ensure_config_dir()
     cfg = {"effect": effect, "params": params}
-    CONFIG_FILE.write_text(json.dumps(cfg))
+    if cfg == _CACHE["cfg"]:
+        return
+    ensure_config_dir()
+    CONFIG_FILE.write_bytes(json.dumps(cfg, separators=(",", ":")).encode("ascii"))
+    _CACHE["mtime"] = CONFIG_FILE.stat().st_mtime_ns
+    _CACHE["cfg"] = cfg
 
 def load_config():
-    if not CONFIG_FILE.exists():
+    try:
+        mtime = CONFIG_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
         return None
-    return json.loads(CONFIG_FILE.read_text())
+    if mtime == _CACHE["mtime"]:
+        return _CACHE["cfg"]
+    try:
+        cfg = json.loads(CONFIG_FILE.read_bytes())
+    except FileNotFoundError:
+        # File deleted between the stat and the read
+        return None
+    _CACHE["mtime"] = mtime
+    _CACHE["cfg"] = cfg
+    return cfg
 
 def create_systemd_service(cfg):
     """Create a systemd user service to run the RGB effect on startup"""
     ensure_systemd_dir()
     
-    # Find the full path to rgbkb command
-    try:
-        result = subprocess.run(["which", "rgbkb"], capture_output=True, text=True, check=True)
-        rgbkb_path = result.stdout.strip()
-    except subprocess.CalledProcessError:
-        # Fallback to common paths
-        rgbkb_path = "/usr/local/bin/rgbkb"
-        if not Path(rgbkb_path).exists():
-            rgbkb_path = "/usr/bin/rgbkb"
-    
+    # Find the full path to rgbkb command (PATH scan once per process)
+    global _RGBKB_PATH
+    if _RGBKB_PATH is None:
+        _RGBKB_PATH = shutil.which("rgbkb")
+        if _RGBKB_PATH is None:
+            # Fallback to common paths
+            _RGBKB_PATH = "/usr/local/bin/rgbkb"
+            if not Path(_RGBKB_PATH).exists():
+                _RGBKB_PATH = "/usr/bin/rgbkb"
+    rgbkb_path = _RGBKB_PATH
+
     # Build the command from saved config
     cmd_parts = [rgbkb_path, cfg["effect"]]
     
@@ -51,8 +89,8 @@ def create_systemd_service(cfg):
             cmd_parts.append(f"--{param}")
             cmd_parts.append(str(value))
     
-    # Join command parts with proper escaping
-    command = " ".join(cmd_parts)
+    # Quote each argv element so systemd's own splitter gets unambiguous input
+    command = " ".join(map(shlex.quote, cmd_parts))
     
     service_content = f"""[Unit]
 Description=RGBKB RGB Keyboard Effect
@@ -69,23 +107,26 @@ Environment=HOME={os.getenv('HOME')}
 WantedBy=default.target
 """
     
-    service_file = SYSTEMD_USER_DIR / SYSTEMD_SERVICE_NAME
-    service_file.write_text(service_content)
-    
-    return service_file
+    # Only rewrite the unit (and later daemon-reload) when the content changed
+    try:
+        changed = SERVICE_FILE.read_text() != service_content
+    except FileNotFoundError:
+        changed = True
+    if changed:
+        SERVICE_FILE.write_text(service_content)
+
+    return SERVICE_FILE, changed
 
-def enable_systemd_service():
+def enable_systemd_service(daemon_reload=True):
     """Enable and start the systemd service"""
     try:
-        # Reload systemd to recognize the new service
-        subprocess.run(["systemctl", "--user", "daemon-reload"], check=True)
-        
-        # Enable the service to start on boot
-        subprocess.run(["systemctl", "--user", "enable", SYSTEMD_SERVICE_NAME], check=True)
-        
-        # Start the service now
-        subprocess.run(["systemctl", "--user", "start", SYSTEMD_SERVICE_NAME], check=True)
-        
+        # Reload systemd only when the unit file actually changed on disk
+        if daemon_reload:
+            subprocess.run(["systemctl", "--user", "daemon-reload"], check=True)
+
+        # Enable the service to start on boot and start it now, in one call
+        subprocess.run(["systemctl", "--user", "enable", "--now", SYSTEMD_SERVICE_NAME], check=True)
+
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to enable systemd service: {e}")
@@ -94,39 +135,38 @@ def enable_systemd_service():
 def disable_systemd_service():
     """Disable and remove the systemd service"""
     try:
-        # Stop the service
-        subprocess.run(["systemctl", "--user", "stop", SYSTEMD_SERVICE_NAME], 
+        # Stop and disable the service in one call
+        subprocess.run(["systemctl", "--user", "disable", "--now", SYSTEMD_SERVICE_NAME],
                       check=False)  # Don't fail if service doesn't exist
-        
-        # Disable the service
-        subprocess.run(["systemctl", "--user", "disable", SYSTEMD_SERVICE_NAME], 
-                      check=False)  # Don't fail if service doesn't exist
-        
+
         # Remove the service file
-        service_file = SYSTEMD_USER_DIR / SYSTEMD_SERVICE_NAME
-        if service_file.exists():
-            service_file.unlink()
-        
+        if SERVICE_FILE.exists():
+            SERVICE_FILE.unlink()
+
         # Reload systemd
         subprocess.run(["systemctl", "--user", "daemon-reload"], check=True)
-        
+
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to disable systemd service: {e}")
         return False
 
 def clear_screen():
-    os.system("clear")
+    sys.stdout.write(_CLEAR)
+    sys.stdout.flush()
 
 def run_rgbkb_command(args):
+    # Invoke the click CLI in-process: no subprocess, no interpreter startup.
+    # USB failures (permissions, unplug mid-transfer) must not kill the menu.
     try:
-        subprocess.run(["rgbkb"] + args, check=True)
-    except subprocess.CalledProcessError:
+        rgbkb_cli.main(args=args, standalone_mode=False)
+    except (click.ClickException, SystemExit, USBError):
         print("❌ Failed to run:", " ".join(["rgbkb"] + args))
 
 def get_input(prompt, default=None, validator=None):
+    full_prompt = f"{prompt} [{default}]: "
     while True:
-        val = input(f"{prompt} [{default}]: ").strip()
+        val = input(full_prompt).strip()
         if not val:
             return default
         if validator:
@@ -137,70 +177,82 @@ def get_input(prompt, default=None, validator=None):
         else:
             return val
 
-def get_hex_color():
-    preset_colors = {
-        "1": ("Red", "FF0000"),
-        "2": ("Green", "00FF00"),
-        "3": ("Blue", "0000FF"),
-        "4": ("Yellow", "FFFF00"),
-        "5": ("Purple", "800080"),
-        "6": ("Cyan", "00FFFF"),
-        "7": ("White", "FFFFFF"),
-        "8": ("Pink", "FF69B4"),
-        "9": ("Custom hex code", None),
-    }
+PRESET_COLORS = {
+    "1": ("Red", "FF0000"),
+    "2": ("Green", "00FF00"),
+    "3": ("Blue", "0000FF"),
+    "4": ("Yellow", "FFFF00"),
+    "5": ("Purple", "800080"),
+    "6": ("Cyan", "00FFFF"),
+    "7": ("White", "FFFFFF"),
+    "8": ("Pink", "FF69B4"),
+    "9": ("Custom hex code", None),
+}
+
+# Sub-menus rendered once at import; retries reprint with a single write
+_COLOR_MENU = "\nChoose a color:\n" + "\n".join(
+    f" {k}) {name:<7} (# {hexc})" if hexc else f" {k}) {name}"
+    for k, (name, hexc) in PRESET_COLORS.items()
+) + "\n"
+
+_DIRECTION_MENU = (
+    "\nChoose a direction:\n"
+    " 1) Right\n"
+    " 2) Left\n"
+    " 3) Up\n"
+    " 4) Down\n"
+    " 5) Clockwise\n"
+    " 6) Counterclockwise\n"
+)
 
+def get_hex_color():
     while True:
-        print("\nChoose a color:")
-        for k, (name, hexc) in preset_colors.items():
-            if hexc:
-                print(f" {k}) {name:<7} (# {hexc})")
-            else:
-                print(f" {k}) {name}")
+        sys.stdout.write(_COLOR_MENU)
+        sys.stdout.flush()
 
         choice = input("Select a color number (default 7): ").strip() or "7"
 
-        if choice in preset_colors:
-            name, hexcode = preset_colors[choice]
+        if choice in PRESET_COLORS:
+            name, hexcode = PRESET_COLORS[choice]
             if hexcode:
                 print(f"Selected {name} with hex #{hexcode}")
                 return hexcode
             else:
                 # Custom hex input
                 val = input("Enter custom hex color (6 hex digits, e.g. 1A2B3C): ").strip()
-                if len(val) == 6 and all(c in "0123456789abcdefABCDEF" for c in val):
+                if _HEX6.fullmatch(val):
                     return val
                 else:
                     print("❌ Invalid hex code. Try again.")
         else:
             print("❌ Invalid choice. Try again.")
 
+# Reverse mapping to the hardware scale: 1 -> 11, 11 -> 1
+_SPEED_MAP = tuple(12 - i for i in range(12))
+
 def get_speed():
     def validator(x):
         f = float(x)
         if not (1 <= f <= 11):
             raise ValueError()
-        return 12 - int(f)  # Reverse mapping: 1 -> 11, 11 -> 1
+        return _SPEED_MAP[int(f)]
 
-    val = get_input("Enter speed (1=slow, 11=fast)", "11", validator) 
+    val = get_input("Enter speed (1=slow, 11=fast)", "11", validator)
     print(f"→ Mapped speed: {val} (hardware scale)")
     return val
 
 def get_brightness():
-    return get_input(
-        "Enter brightness (0-32)", 
-        "32", 
-        lambda x: int(x) if 0 <= int(x) <= 32 else (_ for _ in ()).throw(ValueError())
-    )
+    def validator(x):
+        v = int(x)
+        if not (0 <= v <= 32):
+            raise ValueError()
+        return v
+
+    return get_input("Enter brightness (0-32)", "32", validator)
 
 def get_direction():
-    print("\nChoose a direction:")
-    print(" 1) Right")
-    print(" 2) Left")
-    print(" 3) Up")
-    print(" 4) Down")
-    print(" 5) Clockwise")
-    print(" 6) Counterclockwise")
+    sys.stdout.write(_DIRECTION_MENU)
+    sys.stdout.flush()
 
     while True:
         choice = input("Select a direction number (default 1): ").strip() or "1"
@@ -214,67 +266,73 @@ def apply_effect(name, supports_color=False, supports_speed=False, supports_brig
     print(f"Applying effect: {name.capitalize()}\n")
 
     args = [name]
+    params = {"hexcolor": None, "speed": None, "level": None, "direction": None}
 
     if supports_color:
-        color = get_hex_color()
-        args.append(color)
+        params["hexcolor"] = get_hex_color()
+        args.append(params["hexcolor"])
 
     if supports_speed:
-        speed = get_speed()
-        args += ["--speed", str(speed)]
+        params["speed"] = get_speed()
+        args += ["--speed", str(params["speed"])]
 
     if supports_brightness:
-        level = get_brightness()
-        args += ["--level", str(level)]
+        params["level"] = get_brightness()
+        args += ["--level", str(params["level"])]
 
     if supports_direction:
-        direction = get_direction()
-        args += ["--direction", str(direction)]
+        params["direction"] = get_direction()
+        args += ["--direction", str(params["direction"])]
 
     run_rgbkb_command(args)
-    save_config(name, {"hexcolor": args[1] if supports_color else None, "speed": speed if supports_speed else None, "level": level if supports_brightness else None, "direction": direction if supports_direction else None})
+    save_config(name, params)
     print(f"\n✅ Effect '{name}' applied successfully!")
 
-def main():
-    menu = {
-        "1": ("wave",        {"color": False, "speed": True, "brightness": True, "direction": True}),
-        "2": ("neon",        {"color": False, "speed": True, "brightness": True, "direction": False}),
-        "3": ("all",         {"color": True,  "speed": False, "brightness": False, "direction": False}),
-        "4": ("breathe",     {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "5": ("ripple",      {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "6": ("snake",       {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "7": ("heartbeat",   {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "8": ("snow",        {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "9": ("fireball",    {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "10":("stars",       {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "11":("spot",        {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "12":("lightning",   {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "13":("rain",        {"color": True,  "speed": True,  "brightness": True, "direction": False}),
-        "0": ("exit",        {}),
-        "14": ("apply",      {}),
-        "15": ("remove_startup", {}),
-    }
+MENU = {
+    "1": ("wave",        {"color": False, "speed": True, "brightness": True, "direction": True}),
+    "2": ("neon",        {"color": False, "speed": True, "brightness": True, "direction": False}),
+    "3": ("all",         {"color": True,  "speed": False, "brightness": False, "direction": False}),
+    "4": ("breathe",     {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "5": ("ripple",      {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "6": ("snake",       {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "7": ("heartbeat",   {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "8": ("snow",        {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "9": ("fireball",    {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "10":("stars",       {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "11":("spot",        {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "12":("lightning",   {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "13":("rain",        {"color": True,  "speed": True,  "brightness": True, "direction": False}),
+    "0": ("exit",        {}),
+    "14": ("apply",      {}),
+    "15": ("remove_startup", {}),
+}
+
+# Display order, computed once at import instead of per menu redraw
+MENU_SORTED = tuple(sorted(MENU.items(), key=lambda kv: int(kv[0]) if kv[0].isdigit() else 999))
+
+# Full menu screen rendered once at import; each redraw is a single write
+_MENU_TEXT = "🎛️  RGBKB Mode Selector\n\n" + "\n".join(
+    f" {key}. Remove startup service" if label == "remove_startup" else f" {key}. {label.capitalize()}"
+    for key, (label, _) in MENU_SORTED
+) + "\n"
 
+def main():
     while True:
         clear_screen()
-        print("🎛️  RGBKB Mode Selector\n")
-        for key, (label, _) in sorted(menu.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 999):
-            if label == "remove_startup":
-                print(f" {key}. Remove startup service")
-            else:
-                print(f" {key}. {label.capitalize()}")
+        sys.stdout.write(_MENU_TEXT)
+        sys.stdout.flush()
         choice = input("\nChoose an effect number (0 to exit): ").strip()
 
         if choice == "0":
             clear_screen()
             print("👋 Goodbye!")
             break
-        if choice not in menu:
+        if choice not in MENU:
             print("\n❌ Invalid choice. Press Enter to try again.")
             input()
             continue
 
-        name, config = menu[choice]
+        name, config = MENU[choice]
         if name == "apply":
             cfg = load_config()
             if not cfg:
@@ -282,25 +340,23 @@ def main():
                 input("\nPress Enter to return to menu...")
                 continue
             
-            # Build the command args correctly
-            cmd_args = [cfg["effect"]]
-            if cfg["params"]["hexcolor"] is not None:
-                cmd_args.append(cfg["params"]["hexcolor"])
-            
-            for param, value in cfg["params"].items():
-                if value is not None and param != "hexcolor":
-                    cmd_args.extend([f"--{param}", str(value)])
-            
-            # Apply the effect immediately
-            run_rgbkb_command(cmd_args)
+            # Apply the effect immediately via the cli callbacks — no argv rebuild.
+            # KeyError/TypeError/ValueError cover a hand-edited config, USBError a
+            # missing or failing device.
+            try:
+                run_effect(cfg["effect"], cfg["params"])
+            except (click.ClickException, SystemExit, KeyError, TypeError, ValueError, USBError):
+                print(f"❌ Failed to apply effect '{cfg['effect']}'.")
+                input("\nPress Enter to return to menu...")
+                continue
             print(f"\n✅ Effect '{cfg['effect']}' applied successfully!")
             
             # Ask if user wants to enable on startup
             enable_startup = input("\nEnable this effect on system startup? (y/n) [n]: ").strip().lower()
             if enable_startup == 'y':
                 print("Creating systemd service...")
-                service_file = create_systemd_service(cfg)
-                if enable_systemd_service():
+                service_file, changed = create_systemd_service(cfg)
+                if enable_systemd_service(daemon_reload=changed):
                     print(f"✅ Systemd service created and enabled!")
                     print(f"Effect will now run automatically on system startup.")
                     print(f"Service file: {service_file}")
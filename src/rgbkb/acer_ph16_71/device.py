@@ -415,8 +415,11 @@ class AcerPredatorPH1671(RgbKeyboard):
         self.device.open()
         self.device.claim_interface(3)
         self.device.clear_halt(4, TransferDirection.OUT)
+        # The descriptor is identical for every packet; build it once and push
+        # the packets back-to-back in a tight loop
+        transfer = ControlTransfer(RequestType.CLASS, Recipient.INTERFACE, 9, 0x0300, 3)
         for command in commands:
-            self.send_control_transfer(9, 0x0300, 3, command, RequestType.CLASS, Recipient.INTERFACE)
+            self.device.control_transfer_out(transfer, command)
         self.device.release_interface(3)
         self.device.close()
         self.device.attach_standard_drivers()
@@ -5,8 +5,8 @@ A CLI tool to control RGB backlight effects on the Acer PH16-71 keyboard, with p
 Stores the last-used effect in ~/.config/rgbkb/config.json and provides an `apply` command to re-apply
 automatically (e.g. via systemd at boot).
 """
+import functools
 import json
-import subprocess
 import sys
 from pathlib import Path
 
@@ -28,21 +28,67 @@ def ensure_config_dir():
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
 
 
+# In-process cache so repeated load/save calls skip JSON parsing and disk I/O
+_CACHE = {"mtime": None, "cfg": None}
+
+
 def save_config(effect: str, params: dict):
-    ensure_config_dir()
     cfg = {"effect": effect, "params": params}
-    CONFIG_FILE.write_text(json.dumps(cfg))
+    if cfg == _CACHE["cfg"]:
+        return
+    ensure_config_dir()
+    CONFIG_FILE.write_bytes(json.dumps(cfg, separators=(",", ":")).encode("ascii"))
+    _CACHE["mtime"] = CONFIG_FILE.stat().st_mtime_ns
+    _CACHE["cfg"] = cfg
 
 
 def load_config():
-    if not CONFIG_FILE.exists():
+    try:
+        mtime = CONFIG_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime == _CACHE["mtime"]:
+        return _CACHE["cfg"]
+    try:
+        cfg = json.loads(CONFIG_FILE.read_bytes())
+    except FileNotFoundError:
+        # File deleted between the stat and the read
         return None
-    return json.loads(CONFIG_FILE.read_text())
+    _CACHE["mtime"] = mtime
+    _CACHE["cfg"] = cfg
+    return cfg
 
 
 # Utility functions
 
 
+# Cached USB enumeration so consecutive in-process commands skip the device walk.
+# Only a non-empty result is kept, so a missing keyboard is re-probed next time.
+_devs_cache = ()
+
+
+def _find_devices():
+    global _devs_cache
+    if not _devs_cache:
+        _devs_cache = find_supported_devices()
+    return _devs_cache
+
+
+_kb_singleton = None
+
+
+def _get_kb() -> RgbKeyboard:
+    """Return the first supported keyboard, enumerating USB at most once."""
+    global _kb_singleton
+    if _kb_singleton is None:
+        devs = _find_devices()
+        if not devs:
+            click.echo("No compatible keyboard found.", err=True)
+            sys.exit(1)
+        _kb_singleton = devs[0]
+    return _kb_singleton
+
+
 def map_speed(speed: float) -> int:
     """Map float speed to hardware value: >=1 uses floor, <1 maps to 0 (ultra-fast)."""
     return int(speed) if speed >= 1 else 0
@@ -53,50 +99,78 @@ def parse_hex(hexcolor: str) -> tuple[int, int, int]:
     hexcolor = hexcolor.lstrip("#")
     if len(hexcolor) != 6:
         raise click.BadParameter("Color must be a 6-digit RRGGBB hex.")
-    return tuple(int(hexcolor[i : i + 2], 16) for i in (0, 2, 4))
+    try:
+        r, g, b = bytes.fromhex(hexcolor)
+    except ValueError:
+        raise click.BadParameter("Color must be a 6-digit RRGGBB hex.")
+    return r, g, b
 
 
 # Packet builders for each effect
+#
+# Packets are 8 bytes: effect packets are "08 02 [opcode] [speed] [brightness]
+# 01 [direction] 9b". The constant parts are precomputed as templates at import
+# time; builders copy a template and patch the variable bytes in place.
+
+_TEMPLATE_COLOR = bytes.fromhex("14 00 00 00 00 00 00 00")
+_TEMPLATE_STATIC = bytes.fromhex("08 02 01 00 20 01 01 9b")
+_TEMPLATE_BREATHE = bytes.fromhex("08 02 02 00 20 01 01 9b")
+_TEMPLATE_WAVE = bytes.fromhex("08 02 03 00 20 01 01 9b")
+_TEMPLATE_RIPPLE = bytes.fromhex("08 02 06 00 20 01 01 9b")
+_TEMPLATE_SNAKE = bytes.fromhex("08 02 05 00 20 01 01 9b")
+_TEMPLATE_HEARTBEAT = bytes.fromhex("08 02 29 00 20 01 01 9b")
+_TEMPLATE_SNOW = bytes.fromhex("08 02 28 00 20 01 01 9b")
+_TEMPLATE_FIREBALL = bytes.fromhex("08 02 27 00 20 01 01 9b")
+_TEMPLATE_STARS = bytes.fromhex("08 02 26 00 20 01 01 9b")
+_TEMPLATE_SPOT = bytes.fromhex("08 02 25 00 20 01 01 9b")
+_TEMPLATE_LIGHTNING = bytes.fromhex("08 02 12 00 20 01 01 9b")
+_TEMPLATE_RAIN = bytes.fromhex("08 02 0a 00 20 01 01 9b")
+_TEMPLATE_NEON = bytes.fromhex("08 02 08 00 20 01 01 9b")
+
+
+def _patch_effect(template: bytes, speed: int, brightness: int) -> bytes:
+    """Copy an effect template and patch in the speed and brightness bytes."""
+    pkt = bytearray(template)
+    pkt[3] = speed
+    pkt[4] = brightness
+    return bytes(pkt)
 
 
 def build_color(r: int, g: int, b: int) -> bytes:
     """Load custom RGB color into keyboard buffer."""
-    return bytes([0x14, 0x00, 0x00, r, g, b, 0x00, 0x00])
+    pkt = bytearray(_TEMPLATE_COLOR)
+    pkt[3:6] = (r, g, b)
+    return bytes(pkt)
 
 
 def build_static_color(r: int, g: int, b: int) -> list[bytes]:
     """Apply last-loaded color as static backlight."""
     # 08 02 01 00 [brightness] 01 01 9b (brightness=32 default)
-    return [bytes([0x08, 0x02, 0x01, 0x00, 0x20, 0x01, 0x01, 0x9B])]
+    return [_TEMPLATE_STATIC]
 
 
 def build_breathing(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Breathing pulse effect in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x02, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_BREATHE, speed, brightness)]
 
 
 def build_wave(speed: int, brightness: int, direction: int) -> list[bytes]:
     """Color wave effect; direction codes: 1=right,...,6=counterclockwise."""
-    return [bytes([0x08, 0x02, 0x03, speed, brightness, 0x01, direction, 0x9B])]
+    pkt = bytearray(_TEMPLATE_WAVE)
+    pkt[3] = speed
+    pkt[4] = brightness
+    pkt[6] = direction
+    return [bytes(pkt)]
 
 
 def build_ripple(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Center-originating ripple effect in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x06, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_RIPPLE, speed, brightness)]
 
 
 def build_snake(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Snake chase animation in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x05, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_SNAKE, speed, brightness)]
 
 
 # Additional effects
@@ -104,63 +178,42 @@ def build_snake(r: int, g: int, b: int, speed: int, brightness: int) -> list[byt
 
 def build_heartbeat(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Heartbeat pulse effect in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x29, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_HEARTBEAT, speed, brightness)]
 
 
 def build_snow(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Snowflake fall and melt in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x28, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_SNOW, speed, brightness)]
 
 
 def build_fireball(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Fireball burst effect in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x27, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_FIREBALL, speed, brightness)]
 
 
 def build_stars(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Twinkling stars effect in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x26, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_STARS, speed, brightness)]
 
 
 def build_spot(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Keypress spot effect in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x25, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_SPOT, speed, brightness)]
 
 
 def build_lightning(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Random lightning flashes in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x12, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_LIGHTNING, speed, brightness)]
 
 
 def build_rain(r: int, g: int, b: int, speed: int, brightness: int) -> list[bytes]:
     """Raindrop fall effect in custom color."""
-    return [
-        build_color(r, g, b),
-        bytes([0x08, 0x02, 0x0A, speed, brightness, 0x01, 0x01, 0x9B]),
-    ]
+    return [build_color(r, g, b), _patch_effect(_TEMPLATE_RAIN, speed, brightness)]
 
 
 def build_neon(speed: int, brightness: int) -> list[bytes]:
     """Pulsing neon glow effect (no custom color)."""
-    return [bytes([0x08, 0x02, 0x08, speed, brightness, 0x01, 0x01, 0x9B])]
+    return [_patch_effect(_TEMPLATE_NEON, speed, brightness)]
 
 
 # Common CLI group
@@ -178,18 +231,7 @@ def apply():
         click.echo("No saved configuration found.", err=True)
         sys.exit(1)
     effect = cfg["effect"]
-    params = cfg["params"]
-    cmd = ["rgbkb", effect]
-    for k, v in params.items():
-        if k == "hexcolor":
-            cmd.append(v)
-        elif k == "direction":
-            cmd += ["--direction", str(v)]
-        elif k == "speed":
-            cmd += ["--speed", str(v)]
-        elif k in ("brightness", "level"):
-            cmd += ["--level", str(v)]
-    subprocess.run(cmd, check=True)
+    run_effect(effect, cfg["params"])
     click.echo(f"Applied saved effect: {effect}")
 
 
@@ -199,11 +241,7 @@ def apply():
 def all_mode(hexcolor):
     """Load and apply a static color to the entire keyboard."""
     r, g, b = parse_hex(hexcolor)
-    devs = find_supported_devices()
-    if not devs:
-        click.echo("No compatible keyboard found.", err=True)
-        sys.exit(1)
-    kb = devs[0]
+    kb = _get_kb()
     cmds = [PREAMBLE_INIT, build_color(r, g, b)] + build_static_color(r, g, b)
     kb.send_commands(*cmds)
     save_config("all", {"hexcolor": hexcolor})
@@ -231,11 +269,7 @@ def breathe(hexcolor, speed, brightness):
     """Begin breathing animation in a specified color."""
     r, g, b = parse_hex(hexcolor)
     hw = map_speed(speed)
-    devs = find_supported_devices()
-    if not devs:
-        click.echo("No compatible keyboard found.", err=True)
-        sys.exit(1)
-    kb = devs[0]
+    kb = _get_kb()
     cmds = [PREAMBLE_INIT] + build_breathing(r, g, b, hw, brightness)
     kb.send_commands(*cmds)
     save_config("breathe", {"hexcolor": hexcolor, "speed": hw, "level": brightness})
@@ -267,11 +301,7 @@ def breathe(hexcolor, speed, brightness):
 def wave(speed, brightness, direction):
     """Initiate continuous wave animation across keyboard."""
     hw = map_speed(speed)
-    devs = find_supported_devices()
-    if not devs:
-        click.echo("No compatible keyboard found.", err=True)
-        sys.exit(1)
-    kb = devs[0]
+    kb = _get_kb()
     cmds = [PREAMBLE_INIT] + build_wave(hw, brightness, direction)
     kb.send_commands(*cmds)
     save_config("wave", {"speed": hw, "level": brightness, "direction": direction})
@@ -297,66 +327,93 @@ def wave(speed, brightness, direction):
 def neon(speed, brightness):
     """Initiate pulsing neon glow across keyboard."""
     hw = map_speed(speed)
-    devs = find_supported_devices()
-    if not devs:
-        click.echo("No compatible keyboard found.", err=True)
-        sys.exit(1)
-    kb = devs[0]
+    kb = _get_kb()
     cmds = [PREAMBLE_INIT] + build_neon(hw, brightness)
     kb.send_commands(*cmds)
     save_config("neon", {"speed": hw, "level": brightness})
     click.echo(f"Started neon speed={hw} bright={brightness}")
 
 
-# Helper to register custom-color effects
+# Shared handler for custom-color effects
 
 
-def register_color_effect(name, builder, short_help):
-    @cli.command(name=name, short_help=short_help)
-    @click.argument("hexcolor", metavar="HEX", required=True)
-    @click.option(
-        "--speed",
-        default=1.0,
-        type=float,
-        help=f"{name.capitalize()} speed (>=1 hw speed, <1 ultra-fast)",
-    )
-    @click.option(
-        "--level",
-        "--brightness",
-        "brightness",
-        default=32,
-        type=int,
-        help=f"{name.capitalize()} brightness (0–32)",
-    )
-    def _cmd(hexcolor, speed, brightness, _builder=builder, _name=name):
-        """Start {} effect in a specified color.""".format(_name.capitalize())
-        r, g, b = parse_hex(hexcolor)
-        hw = map_speed(speed)
-        devs = find_supported_devices()
-        if not devs:
-            click.echo("No compatible keyboard found.", err=True)
-            sys.exit(1)
-        kb = devs[0]
-        cmds = [PREAMBLE_INIT] + _builder(r, g, b, hw, brightness)
-        kb.send_commands(*cmds)
-        save_config(name, {"hexcolor": hexcolor, "speed": hw, "level": brightness})
-        click.echo(f"Started {_name} #{hexcolor} speed={hw} bright={brightness}")
+def _run_color_effect(name, builder, hexcolor, speed, brightness):
+    """Start the named effect in a specified color."""
+    r, g, b = parse_hex(hexcolor)
+    hw = map_speed(speed)
+    kb = _get_kb()
+    cmds = [PREAMBLE_INIT] + builder(r, g, b, hw, brightness)
+    kb.send_commands(*cmds)
+    save_config(name, {"hexcolor": hexcolor, "speed": hw, "level": brightness})
+    click.echo(f"Started {name} #{hexcolor} speed={hw} bright={brightness}")
+
 
-    return _cmd
+def _color_effect_params(name):
+    return [
+        click.Argument(["hexcolor"], metavar="HEX", required=True),
+        click.Option(
+            ["--speed"],
+            default=1.0,
+            type=float,
+            help=f"{name.capitalize()} speed (>=1 hw speed, <1 ultra-fast)",
+        ),
+        click.Option(
+            ["--level", "--brightness", "brightness"],
+            default=32,
+            type=int,
+            help=f"{name.capitalize()} brightness (0–32)",
+        ),
+    ]
 
 
 # Registering custom-color effects
-register_color_effect(
-    "ripple", build_ripple, "Center-originating ripple with custom color"
+_COLOR_EFFECTS = (
+    ("ripple", build_ripple, "Center-originating ripple with custom color"),
+    ("snake", build_snake, "Snake chase animation with custom color"),
+    ("heartbeat", build_heartbeat, "Heartbeat pulse in custom color"),
+    ("snow", build_snow, "Snowflake fall effect with custom color"),
+    ("fireball", build_fireball, "Fireball burst in custom color"),
+    ("stars", build_stars, "Twinkling stars in custom color"),
+    ("spot", build_spot, "Keypress spot effect with custom color"),
+    ("lightning", build_lightning, "Random lightning in custom color"),
+    ("rain", build_rain, "Raindrop fall effect with custom color"),
 )
-register_color_effect("snake", build_snake, "Snake chase animation with custom color")
-register_color_effect("heartbeat", build_heartbeat, "Heartbeat pulse in custom color")
-register_color_effect("snow", build_snow, "Snowflake fall effect with custom color")
-register_color_effect("fireball", build_fireball, "Fireball burst in custom color")
-register_color_effect("stars", build_stars, "Twinkling stars in custom color")
-register_color_effect("spot", build_spot, "Keypress spot effect with custom color")
-register_color_effect("lightning", build_lightning, "Random lightning in custom color")
-register_color_effect("rain", build_rain, "Raindrop fall effect with custom color")
+
+for _name, _builder, _short_help in _COLOR_EFFECTS:
+    cli.add_command(
+        click.Command(
+            name=_name,
+            short_help=_short_help,
+            help=f"Start {_name} effect in a specified color.",
+            params=_color_effect_params(_name),
+            callback=functools.partial(_run_color_effect, _name, _builder),
+        )
+    )
+
+
+# Direct dispatch to the command callbacks for re-applying a saved config
+_EFFECT_FUNCS = {name: cmd.callback for name, cmd in cli.commands.items() if name != "apply"}
+
+
+def run_effect(effect: str, params: dict):
+    """Invoke an effect command's callback directly with saved-config params.
+
+    Skips the argv round-trip and click parsing; coerces the numeric params
+    the way the click option types would.
+    """
+    kwargs = {}
+    for k, v in params.items():
+        if v is None:
+            continue
+        if k == "hexcolor":
+            kwargs["hexcolor"] = v
+        elif k == "speed":
+            kwargs["speed"] = float(v)
+        elif k in ("brightness", "level"):
+            kwargs["brightness"] = int(v)
+        elif k == "direction":
+            kwargs["direction"] = int(v)
+    _EFFECT_FUNCS[effect](**kwargs)
 
 
 main = cli